@@ -12,6 +12,7 @@ import (
 	"path/filepath"
 	"strconv"
 	"strings"
+	"sync"
 
 	"github.com/lometsj/code_server/static_binary/linux"
 )
@@ -37,6 +38,9 @@ type RefResponse struct {
 	Error   string   `json:"error,omitempty"`
 }
 
+// 批量接口同时进行的查询数上限，每个查询都会启动ctags/global子进程
+const batchConcurrency = 8
+
 type CodeAnalyzer struct {
 	codeDir   string
 	dataDir   string
@@ -378,6 +382,86 @@ func (s *Server) findRefsHandler(w http.ResponseWriter, r *http.Request) {
 	json.NewEncoder(w).Encode(response)
 }
 
+func (s *Server) getSymbolBatchHandler(w http.ResponseWriter, r *http.Request) {
+	if r.Method != http.MethodPost {
+		http.Error(w, "Method not allowed", http.StatusMethodNotAllowed)
+		return
+	}
+
+	var req struct {
+		Symbols []string `json:"symbols"`
+	}
+
+	if err := json.NewDecoder(r.Body).Decode(&req); err != nil {
+		http.Error(w, "Invalid request body", http.StatusBadRequest)
+		return
+	}
+
+	// 各符号并发查询，同时进行的查询数不超过batchConcurrency，结果按请求顺序返回
+	responses := make([]SymbolResponse, len(req.Symbols))
+	var wg sync.WaitGroup
+	sem := make(chan struct{}, batchConcurrency)
+	for i, symbol := range req.Symbols {
+		wg.Add(1)
+		sem <- struct{}{}
+		go func(i int, symbol string) {
+			defer wg.Done()
+			defer func() { <-sem }()
+			// 单个符号查询panic时只让该符号失败，不能让整个code_server退出
+			defer func() {
+				if r := recover(); r != nil {
+					responses[i] = SymbolResponse{Status: "failed", Error: fmt.Sprint(r)}
+				}
+			}()
+			responses[i] = s.analyzer.GetSymbolInfo(symbol)
+		}(i, symbol)
+	}
+	wg.Wait()
+
+	w.Header().Set("Content-Type", "application/json")
+	json.NewEncoder(w).Encode(responses)
+}
+
+func (s *Server) findRefsBatchHandler(w http.ResponseWriter, r *http.Request) {
+	if r.Method != http.MethodPost {
+		http.Error(w, "Method not allowed", http.StatusMethodNotAllowed)
+		return
+	}
+
+	var req struct {
+		Symbols []string `json:"symbols"`
+	}
+
+	if err := json.NewDecoder(r.Body).Decode(&req); err != nil {
+		http.Error(w, "Invalid request body", http.StatusBadRequest)
+		return
+	}
+
+	// 各符号并发查询，同时进行的查询数不超过batchConcurrency，结果按请求顺序返回
+	responses := make([]RefResponse, len(req.Symbols))
+	var wg sync.WaitGroup
+	sem := make(chan struct{}, batchConcurrency)
+	for i, symbol := range req.Symbols {
+		wg.Add(1)
+		sem <- struct{}{}
+		go func(i int, symbol string) {
+			defer wg.Done()
+			defer func() { <-sem }()
+			// 单个符号查询panic时只让该符号失败，不能让整个code_server退出
+			defer func() {
+				if r := recover(); r != nil {
+					responses[i] = RefResponse{Error: fmt.Sprint(r)}
+				}
+			}()
+			responses[i] = s.analyzer.FindAllRefs(symbol)
+		}(i, symbol)
+	}
+	wg.Wait()
+
+	w.Header().Set("Content-Type", "application/json")
+	json.NewEncoder(w).Encode(responses)
+}
+
 func main() {
 	// 解析命令行参数
 	codeDir := flag.String("code-dir", ".", "代码目录路径")
@@ -428,12 +512,16 @@ func main() {
 	// 设置路由
 	http.HandleFunc("/api/get_symbol", server.getSymbolHandler)
 	http.HandleFunc("/api/find_refs", server.findRefsHandler)
+	http.HandleFunc("/api/get_symbol_batch", server.getSymbolBatchHandler)
+	http.HandleFunc("/api/find_refs_batch", server.findRefsBatchHandler)
 
 	log.Printf("Starting server on %s", *listenAddr)
 	log.Printf("Code directory: %s", *codeDir)
 	log.Printf("API endpoints:")
 	log.Printf("  POST /api/get_symbol - 获取符号信息")
 	log.Printf("  POST /api/find_refs - 获取符号引用")
+	log.Printf("  POST /api/get_symbol_batch - 批量获取符号信息")
+	log.Printf("  POST /api/find_refs_batch - 批量获取符号引用")
 
 	if err := http.ListenAndServe(*listenAddr, nil); err != nil {
 		log.Fatalf("Server failed: %v", err)
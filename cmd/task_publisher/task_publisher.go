@@ -1,6 +1,7 @@
 package main
 
 import (
+	"bufio"
 	"bytes"
 	"encoding/base64"
 	"encoding/json"
@@ -49,6 +50,27 @@ type TaskResponse struct {
 	TaskID  string `json:"task_id"`
 }
 
+// BatchSubmitRequest batch_submit模式下从stdin读取的一行任务
+// prompt优先使用原文字段system_prompt/user_prompt，兼容base64编码的system_b64/user_b64
+type BatchSubmitRequest struct {
+	ID           string `json:"id"`
+	SystemPrompt string `json:"system_prompt"`
+	UserPrompt   string `json:"user_prompt"`
+	SystemB64    string `json:"system_b64"`
+	UserB64      string `json:"user_b64"`
+	CodeServer   string `json:"code_server"`
+	LLMConfig    string `json:"llm_config"`
+}
+
+// BatchSubmitResult batch_submit模式下每个任务输出到stdout的一行结果
+type BatchSubmitResult struct {
+	ID      string `json:"id"`
+	Status  string `json:"status"`
+	Message string `json:"message,omitempty"`
+	TaskID  string `json:"task_id,omitempty"`
+	Error   string `json:"error,omitempty"`
+}
+
 // TaskStatusResponse 任务状态响应
 type TaskStatusResponse struct {
 	Exists bool `json:"exists"`
@@ -336,6 +358,92 @@ func (btp *BatchTaskPublisher) WaitForBatchTasksCompletion(taskID string, maxRet
 	return fmt.Errorf("batch tasks did not complete within %d retries", maxRetries)
 }
 
+// buildBatchTask 把batch_submit的一行请求转换为Task，未指定的code server和LLM配置使用默认值
+func buildBatchTask(req BatchSubmitRequest, defaultCodeServer, defaultLLMConfig string) (Task, error) {
+	systemPrompt := req.SystemPrompt
+	if systemPrompt == "" && req.SystemB64 != "" {
+		decoded, err := base64.StdEncoding.DecodeString(req.SystemB64)
+		if err != nil {
+			return Task{}, fmt.Errorf("failed to decode system prompt: %v", err)
+		}
+		systemPrompt = string(decoded)
+	}
+	userPrompt := req.UserPrompt
+	if userPrompt == "" && req.UserB64 != "" {
+		decoded, err := base64.StdEncoding.DecodeString(req.UserB64)
+		if err != nil {
+			return Task{}, fmt.Errorf("failed to decode user prompt: %v", err)
+		}
+		userPrompt = string(decoded)
+	}
+	if systemPrompt == "" || userPrompt == "" {
+		return Task{}, fmt.Errorf("system prompt and user prompt are required")
+	}
+
+	task := Task{
+		ID:             req.ID,
+		SystemPrompt:   systemPrompt,
+		UserPrompt:     userPrompt,
+		CodeServerName: req.CodeServer,
+		LLMConfigName:  req.LLMConfig,
+	}
+	if task.CodeServerName == "" {
+		task.CodeServerName = defaultCodeServer
+	}
+	if task.LLMConfigName == "" {
+		task.LLMConfigName = defaultLLMConfig
+	}
+	return task, nil
+}
+
+// RunBatchSubmit 从in逐行读取JSON任务并提交，每个任务向out输出一行JSON结果，返回提交失败的任务数
+func (tp *TaskPublisher) RunBatchSubmit(in io.Reader, out io.Writer, defaultCodeServer, defaultLLMConfig string) (int, error) {
+	scanner := bufio.NewScanner(in)
+	// prompt可能很长，放宽单行长度限制
+	scanner.Buffer(make([]byte, 0, 64*1024), 64*1024*1024)
+	encoder := json.NewEncoder(out)
+	failed := 0
+
+	for scanner.Scan() {
+		line := bytes.TrimSpace(scanner.Bytes())
+		if len(line) == 0 {
+			continue
+		}
+
+		var req BatchSubmitRequest
+		result := BatchSubmitResult{}
+		if err := json.Unmarshal(line, &req); err != nil {
+			result.Status = "error"
+			result.Error = fmt.Sprintf("failed to unmarshal request: %v", err)
+		} else if task, err := buildBatchTask(req, defaultCodeServer, defaultLLMConfig); err != nil {
+			result.ID = req.ID
+			result.Status = "error"
+			result.Error = err.Error()
+		} else if resp, err := tp.SubmitTask(task); err != nil {
+			result.ID = req.ID
+			result.Status = "error"
+			result.Error = err.Error()
+		} else {
+			result.ID = req.ID
+			result.Status = resp.Status
+			result.Message = resp.Message
+			result.TaskID = resp.TaskID
+		}
+
+		if result.Status == "error" {
+			failed++
+		}
+		if err := encoder.Encode(result); err != nil {
+			return failed, fmt.Errorf("failed to write result: %v", err)
+		}
+	}
+
+	if err := scanner.Err(); err != nil {
+		return failed, fmt.Errorf("failed to read requests: %v", err)
+	}
+	return failed, nil
+}
+
 // ensureURLProtocol ensures that a URL has the proper protocol prefix
 func ensureURLProtocol(url string) string {
 	if strings.HasPrefix(url, "http://") || strings.HasPrefix(url, "https://") {
@@ -352,6 +460,8 @@ func main() {
 		fmt.Printf("  task_publisher list code\n")
 		fmt.Printf("  task_publisher submit --system-prompt xxx --user-prompt xxx --code-server xxx --llm-config xxx --id xxx\n")
 		fmt.Printf("  task_publisher submit --system-prompt-b64 xxx --user-prompt-b64 xxx --code-server xxx --llm-config xxx --id xxx\n")
+		fmt.Printf("  task_publisher submit --system-prompt-file path --user-prompt-file path --code-server xxx --llm-config xxx --id xxx\n")
+		fmt.Printf("  task_publisher batch_submit [--code-server xxx] [--llm-config xxx] < tasks.jsonl\n")
 		fmt.Printf("  task_publisher get_sym [symbol_name] --code-server name\n")
 		fmt.Printf("  task_publisher find_refs [symbol_name] --code-server name\n")
 		os.Exit(1)
@@ -411,6 +521,8 @@ func main() {
 		userPrompt := flagSet.String("user-prompt", "", "User prompt for the task")
 		systemPromptB64 := flagSet.String("system-prompt-b64", "", "System prompt in base64")
 		userPromptB64 := flagSet.String("user-prompt-b64", "", "User prompt in base64")
+		systemPromptFile := flagSet.String("system-prompt-file", "", "File containing the system prompt")
+		userPromptFile := flagSet.String("user-prompt-file", "", "File containing the user prompt")
 		codeServerName := flagSet.String("code-server", "default", "Code server name")
 		llmConfigName := flagSet.String("llm-config", "default", "LLM configuration name")
 		id := flagSet.String("id", "", "Task ID")
@@ -440,6 +552,25 @@ func main() {
 			finalUserPrompt = string(decoded)
 		}
 
+		// 从文件读取prompt，避免长prompt超出命令行长度限制
+		if *systemPromptFile != "" {
+			content, err := os.ReadFile(*systemPromptFile)
+			if err != nil {
+				fmt.Printf("Error reading system prompt file: %v\n", err)
+				os.Exit(1)
+			}
+			finalSystemPrompt = string(content)
+		}
+
+		if *userPromptFile != "" {
+			content, err := os.ReadFile(*userPromptFile)
+			if err != nil {
+				fmt.Printf("Error reading user prompt file: %v\n", err)
+				os.Exit(1)
+			}
+			finalUserPrompt = string(content)
+		}
+
 		if finalSystemPrompt == "" || finalUserPrompt == "" {
 			fmt.Printf("Error: system-prompt and user-prompt are required for submit action\n")
 			os.Exit(1)
@@ -469,6 +600,27 @@ func main() {
 		fmt.Printf("Task ID: %s\n", resp.TaskID)
 		fmt.Printf("Status: %s\n", resp.Status)
 
+	case "batch_submit":
+		// 从stdin逐行读取任务：{"id","system_prompt","user_prompt","code_server","llm_config"}
+		// system_prompt/user_prompt也可以用base64编码的system_b64/user_b64代替
+		// 每个任务向stdout输出一行JSON结果，一次进程调用即可提交全部任务
+		flagSet := flag.NewFlagSet("batch_submit", flag.ExitOnError)
+		codeServerName := flagSet.String("code-server", "default", "Default code server name")
+		llmConfigName := flagSet.String("llm-config", "default", "Default LLM configuration name")
+
+		// 解析参数，跳过前两个参数（程序名和子命令）
+		flagSet.Parse(os.Args[2:])
+
+		failed, err := publisher.RunBatchSubmit(os.Stdin, os.Stdout, *codeServerName, *llmConfigName)
+		if err != nil {
+			fmt.Fprintf(os.Stderr, "Error running batch submit: %v\n", err)
+			os.Exit(1)
+		}
+		if failed > 0 {
+			fmt.Fprintf(os.Stderr, "%d task(s) failed to submit\n", failed)
+			os.Exit(1)
+		}
+
 	case "get_sym":
 		if len(os.Args) < 3 {
 			fmt.Printf("Usage: task_publisher get_sym [symbol_name] --code-server name\n")
@@ -567,7 +719,7 @@ func main() {
 
 	default:
 		fmt.Printf("Error: unknown subcommand '%s'\n", subcommand)
-		fmt.Printf("Available subcommands: list, submit, get_sym, find_refs\n")
+		fmt.Printf("Available subcommands: list, submit, batch_submit, get_sym, find_refs\n")
 		os.Exit(1)
 	}
 }
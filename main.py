@@ -3,22 +3,22 @@
 
 import os
 import subprocess
-import json
+import orjson
+import fastjsonschema
 import re
 import argparse
 import traceback
 from typing import List, Dict, Any, Literal, Tuple, Optional
 import logging
-from unittest import result
-import openai
+import hashlib
+import shelve
+import sqlite3
+import threading
+import importlib
+from collections import OrderedDict
 import time
-import requests  # 添加导入
-from sensetive import sensitive_problem
-from overflow import overflow_problem
-from command_inject import command_inject_problem
-from mem_leak import mem_leak_problem
-from charset_normalizer import detect
-from jsoncpp import jsoncpp_problem
+import uuid
+import asyncio
 
 
 
@@ -27,48 +27,344 @@ from jsoncpp import jsoncpp_problem
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+#################################register different type of vuln
+# 问题类型名称 -> (模块名, 类名)，只有配置中启用的问题类型才会被导入
+PROBLEM_TYPES = {
+    'sensitive': ('sensetive', 'sensitive_problem'),
+}
+
+
+def load_problem(name: str):
+    """按名称导入已注册的问题类型，名称未注册或模块导入失败时抛出ValueError"""
+    if name not in PROBLEM_TYPES:
+        raise ValueError(f"未知的问题类型: {name}，可选: {', '.join(PROBLEM_TYPES)}")
+    module_name, class_name = PROBLEM_TYPES[name]
+    try:
+        return getattr(importlib.import_module(module_name), class_name)
+    except (ImportError, AttributeError) as e:
+        raise ValueError(f"加载问题类型{name}失败: {str(e)}") from e
+
 class CodeAnalyzer:
     """代码分析器，通过调用code_server获取代码内容"""
 
-    def __init__(self, server):
+    def __init__(self, server, cache_file: Optional[str] = None, revision: Optional[str] = None,
+                 cache_size: int = 4096):
         #server的格式是ip:port，分割后保存到self.server_ip和self.server_port
         self.server_ip, self.server_port = server.split(':')
         self.server_port = int(self.server_port)
         self.server_url = f'http://{self.server_ip}:{self.server_port}'
-        
-    def get_symbol_info(self, symbol: str) -> Dict:
+        self.session = None
+        # 符号查询结果缓存：内存LRU + 可选的shelve持久化缓存（跨运行复用）
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._store = None
+        # code_server是否支持批量接口，旧版本返回404后回退为逐个请求
+        self._batch_supported = True
+        # code_server存活状态由后台任务定期探测，调用方直接读取self.alive
+        self.alive = False
+        self.probe_interval = 5
+        self._probe_task = None
+        if cache_file:
+            if revision is None:
+                logger.warning("已开启符号持久化缓存但未配置code_server_revision，代码变化后缓存不会自动失效")
+            self._store = shelve.open(cache_file)
+            # 换了code_server或者代码版本变化后，持久化缓存全部失效
+            store_revision = f'{self.server_url}@{revision}'
+            if self._store.get('__revision__') != store_revision:
+                self._store.clear()
+                self._store['__revision__'] = store_revision
+
+    async def __aenter__(self):
+        import aiohttp
+        # 所有请求共用一个session，复用到code_server的keep-alive连接，避免每次请求都重新握手
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, limit_per_host=32, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(sock_connect=3, sock_read=30),
+        )
+        self.alive = await self._probe_once()
+        self._probe_task = asyncio.create_task(self._probe())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """停止存活探测，关闭session，释放连接池中的连接，并落盘持久化缓存"""
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    async def _probe_once(self) -> bool:
+        """尝试与code_server建立TCP连接，判断其是否存活"""
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(self.server_ip, self.server_port), 1.0)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        await writer.wait_closed()
+        return True
+
+    async def _probe(self):
+        """后台定期探测code_server存活状态"""
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            self.alive = await self._probe_once()
+
+    async def _post(self, path: str, payload: Dict) -> Any:
+        """发送post请求到code_server并返回解析后的JSON，连接失败时按指数退避重试"""
+        import aiohttp
+        # 后台探测到code_server已经断开时先确认一次，仍然不通就直接失败，不再走完整的重试流程
+        if not self.alive:
+            self.alive = await self._probe_once()
+            if not self.alive:
+                raise aiohttp.ClientConnectionError(f"code_server {self.server_url} 未存活")
+        max_retries = 3
+        backoff_factor = 0.2
+        for attempt in range(max_retries):
+            try:
+                async with self.session.post(self.server_url + path, json=payload) as r:
+                    r.raise_for_status()
+                    return orjson.loads(await r.read())
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == max_retries - 1:
+                    raise
+                logger.warning(f"请求code_server失败，尝试重试 ({attempt+1}/{max_retries}): {str(e)}")
+                await asyncio.sleep(backoff_factor * (2 ** attempt))
+
+    def _cache_get(self, kind: str, symbol: str) -> Optional[Dict]:
+        """依次查内存LRU和持久化缓存，未命中返回None"""
+        key = (kind, symbol)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        if self._store is not None:
+            store_key = hashlib.sha256(f'{kind}:{symbol}'.encode('utf-8')).hexdigest()
+            if store_key in self._store:
+                res_json = orjson.loads(self._store[store_key])
+                self._remember(key, res_json)
+                return res_json
+        return None
+
+    def _cache_put(self, kind: str, symbol: str, res_json: Dict):
+        """缓存code_server返回的结果，返回错误的结果不缓存"""
+        if 'error' in res_json:
+            return
+        if self._store is not None:
+            store_key = hashlib.sha256(f'{kind}:{symbol}'.encode('utf-8')).hexdigest()
+            self._store[store_key] = orjson.dumps(res_json)
+        self._remember((kind, symbol), res_json)
+
+    def _remember(self, key: Tuple[str, str], res_json: Dict):
+        self._cache[key] = res_json
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    async def _cached_post(self, kind: str, path: str, symbol: str) -> Dict:
+        """带缓存的符号查询，key为(kind, symbol)"""
+        res_json = self._cache_get(kind, symbol)
+        if res_json is None:
+            res_json = await self._post(path, {'symbol': symbol})
+            self._cache_put(kind, symbol, res_json)
+        return res_json
+
+    async def _cached_post_batch(self, kind: str, path: str, symbols: List[str]) -> List[Dict]:
+        """批量符号查询，只把未命中缓存的符号一次性发送到批量接口，结果按symbols顺序返回"""
+        import aiohttp
+        results = [self._cache_get(kind, symbol) for symbol in symbols]
+        missing = [i for i, res_json in enumerate(results) if res_json is None]
+        if not missing:
+            return results
+
+        # 同一个符号只请求一次
+        missing_symbols = list(dict.fromkeys(symbols[i] for i in missing))
+        fetched = None
+        if self._batch_supported:
+            try:
+                fetched = await self._post(path + '_batch', {'symbols': missing_symbols})
+            except aiohttp.ClientResponseError as e:
+                if e.status != 404:
+                    raise
+                logger.warning("code_server不支持批量接口，回退为逐个请求")
+                self._batch_supported = False
+        if fetched is None:
+            fetched = await asyncio.gather(*[self._post(path, {'symbol': symbol}) for symbol in missing_symbols])
+
+        if len(fetched) != len(missing_symbols):
+            raise ValueError(f"code_server批量接口返回{len(fetched)}条结果，请求了{len(missing_symbols)}个符号")
+        fetched = dict(zip(missing_symbols, fetched))
+        for symbol, res_json in fetched.items():
+            self._cache_put(kind, symbol, res_json)
+        for i in missing:
+            results[i] = fetched[symbols[i]]
+        return results
+
+    async def get_symbol_info(self, symbol: str) -> Dict:
         """发送post请求到/api/get_symbol 参数为{"symbol":symbol}"""
-        url = f'{self.server_url}/api/get_symbol'
-        params = {'symbol': symbol}
-        response = requests.post(url, json=params)
-        return response.json()
+        return await self._cached_post('get_symbol', '/api/get_symbol', symbol)
     
-    def find_all_refs(self, symbol: str) -> List[Dict]:
+    async def find_all_refs(self, symbol: str) -> List[Dict]:
         """发送post请求到/api/find_refs 参数为{"symbol":symbol}"""
-        url = f'{self.server_url}/api/find_refs'
-        params = {'symbol': symbol}
-        response = requests.post(url, json=params)
-        res_json = response.json()
+        res_json = await self._cached_post('find_refs', '/api/find_refs', symbol)
         if 'error' in res_json:
             print('find refs error:'+res_json['error'])
             return []
-        return res_json['callers']
+        return res_json['callers'] or []
+
+    async def get_symbols_batch(self, names: List[str]) -> List[Dict]:
+        """批量获取符号信息，发送post请求到/api/get_symbol_batch 参数为{"symbols":names}"""
+        if not names:
+            return []
+        return await self._cached_post_batch('get_symbol', '/api/get_symbol', names)
+
+    async def find_refs_batch(self, names: List[str]) -> List[List[Dict]]:
+        """批量获取引用信息，发送post请求到/api/find_refs_batch 参数为{"symbols":names}"""
+        if not names:
+            return []
+        refs_list = []
+        for res_json in await self._cached_post_batch('find_refs', '/api/find_refs', names):
+            if 'error' in res_json:
+                print('find refs error:'+res_json['error'])
+                refs_list.append([])
+            else:
+                refs_list.append(res_json['callers'] or [])
+        return refs_list
+
+class SemanticCache:
+    """LLM响应缓存：先按messages的规范化哈希精确匹配；首轮对话未命中时，再在同一问题类型内按待分析代码的向量相似度匹配"""
+
+    def __init__(self, cache_file: str, threshold: float = 0.9, model_name: str = 'all-MiniLM-L6-v2'):
+        # 向量检索依赖较重，只在开启语义缓存时导入
+        import faiss
+        import numpy as np
+        from sentence_transformers import SentenceTransformer
+
+        self._faiss = faiss
+        self._np = np
+        self.threshold = threshold
+        self.store = shelve.open(cache_file)
+        self.encoder = SentenceTransformer(model_name)
+        # 问题类型 -> (faiss索引, 第i个向量对应的shelve key)，不同问题类型的prompt不同，不能互相命中
+        self.indexes = {}
+        for key, entry in self.store.items():
+            if 'namespace' in entry:
+                self._add(entry['namespace'], key, np.asarray([entry['embedding']], dtype='float32'))
+
+    @staticmethod
+    def _key(messages: List[Dict]) -> str:
+        return hashlib.sha256(orjson.dumps(messages, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    def _add(self, namespace: str, key: str, embedding):
+        if namespace not in self.indexes:
+            self.indexes[namespace] = (self._faiss.IndexFlatIP(embedding.shape[1]), [])
+        index, keys = self.indexes[namespace]
+        index.add(embedding)
+        keys.append(key)
+
+    def _embed(self, text: str):
+        return self._np.asarray(self.encoder.encode([text], normalize_embeddings=True), dtype='float32')
+
+    async def get(self, messages: List[Dict], semantic: Optional[tuple] = None) -> Optional[str]:
+        """查询缓存，命中返回缓存的响应文本，未命中返回None
+
+        Args:
+            messages: 消息列表
+            semantic: (问题类型, 待分析代码)，只在首轮对话传入，为None时只做精确匹配
+        """
+        key = self._key(messages)
+        if key in self.store:
+            return self.store[key]['content']
+        if semantic is None:
+            return None
+        namespace, text = semantic
+        # 编码是CPU密集操作，放到线程里执行，避免阻塞事件循环
+        embedding = await asyncio.to_thread(self._embed, text)
+        if namespace in self.indexes:
+            # 检索很快，留在事件循环线程里执行，避免与update中的index.add并发
+            index, keys = self.indexes[namespace]
+            scores, ids = index.search(embedding, 1)
+            if scores[0][0] >= self.threshold:
+                return self.store[keys[ids[0][0]]]['content']
+        return None
+
+    async def update(self, messages: List[Dict], content: str, semantic: Optional[tuple] = None):
+        """保存一次API调用的响应，semantic含义同get"""
+        key = self._key(messages)
+        if key in self.store:
+            return
+        if semantic is None:
+            self.store[key] = {'content': content}
+            return
+        namespace, text = semantic
+        embedding = await asyncio.to_thread(self._embed, text)
+        self.store[key] = {'content': content, 'namespace': namespace, 'embedding': embedding[0].tolist()}
+        self._add(namespace, key, embedding)
+
+    def close(self):
+        self.store.close()
+
+def _content(message) -> str:
+    """取出大模型响应的文本，兼容ChatCompletionMessage和缓存/流式接口返回的字符串"""
+    return getattr(message, 'content', None) or str(message)
+
 
 class LLMAnalyzer:
     """LLM分析器，负责与大模型交互分析日志函数是否打印敏感信息"""
     
+    # 大模型每轮返回的JSON格式
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "tag": {"enum": ["tsj_have", "tsj_nothave", "tsj_next"]},
+            "requests": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "command": {"enum": ["get_symbol", "find_refs"]},
+                        "sym_name": {"type": "string"}
+                    },
+                    "required": ["command", "sym_name"]
+                }
+            }
+        },
+        "required": ["tag"],
+        "if": {"properties": {"tag": {"const": "tsj_next"}}},
+        "then": {"required": ["requests"]}
+    }
+    
     def __init__(self, code_analyzer: CodeAnalyzer, api_key: str, base_url: str, model: str,
-                 http_server=None):
+                 http_server=None, semantic_cache: Optional[SemanticCache] = None):
+        # openai依赖较重，真正需要调用大模型时才导入
+        import openai
+        
         self.code_analyzer = code_analyzer
+        self.semantic_cache = semantic_cache
         self.api_key = api_key
         self.base_url = base_url
         self.model = model
-        self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
+        self.client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url)
         self.http_server = http_server
         
         if api_key:
             openai.api_key = api_key
         
+        # 返回格式校验器只编译一次，每轮按tag分发处理
+        self._validate = fastjsonschema.compile(self.RESPONSE_SCHEMA)
+        self._handlers = {
+            'tsj_have': self._handle_conclusion,
+            'tsj_nothave': self._handle_conclusion,
+            'tsj_next': self._handle_next,
+        }
+        
+        # 每个任务共用的system提示词后缀
+        self._system_suffix = "\n请使用工具调用获取代码信息并分析问题。"
+        
         # 简化提示词，移除JSON格式要求
         self.prompt_need = '''
 【代码分析功能说明】
@@ -97,17 +393,34 @@ class LLMAnalyzer:
 '''
         
 
-    def query_openai(self, messages: List[Dict], stream=False) -> str:
+    async def query_openai(self, messages: List[Dict], stream=False, prefetch: Optional[Dict] = None,
+                           semantic: Optional[tuple] = None) -> str:
         """调用OpenAI API进行查询
         
         Args:
             messages: 消息列表
             stream: 是否使用流式接口
+            prefetch: 流式接口下，边接收边解析出的get_symbol/find_refs请求会立即发起，
+                (command, sym_name) -> Future 记录到该字典中
+            semantic: (问题类型, 待分析代码)，传入时未精确命中缓存也会按相似度查询语义缓存
             
         Returns:
             如果stream=False，返回完整的响应文本
             如果stream=True，返回完整的响应文本（同时会通过HTTP服务器实时推送）
+
+        Raises:
+            重试后API仍调用失败时抛出原异常
         """
+        import openai
+        
+        if self.semantic_cache:
+            cached = await self.semantic_cache.get(messages, semantic)
+            if cached is not None:
+                logger.info("命中LLM响应缓存，跳过API调用")
+                if stream and self.http_server:
+                    self.http_server.add_message("assistant", cached)
+                return cached
+
         try:
             # 添加重试机制
             max_retries = 3
@@ -117,7 +430,7 @@ class LLMAnalyzer:
                 try:
                     if stream and self.http_server:
                         # 使用流式接口
-                        response = self.client.chat.completions.create(
+                        response = await self.client.chat.completions.create(
                             model=self.model,
                             messages=messages,
                             temperature=0.1,
@@ -125,38 +438,68 @@ class LLMAnalyzer:
                             top_p=0.95,
                             frequency_penalty=0,
                             presence_penalty=0,
-                            tools=self.functions,  # 添加tools参数
-                            tool_choice="auto",  # 设置tool_choice
+                            response_format={"type": "json_object"},  # 设置返回格式为JSON
                             stream=True
                         )
                         
-                        # 收集完整响应用于返回
-                        full_response = ""
+                        # 收集完整响应用于返回，各块先放入列表，结束后一次拼接
+                        chunks = []
+                        # 逐token循环中频繁调用的方法提前绑定到局部变量
+                        append_chunk = chunks.append
+                        add_message_chunk = self.http_server.add_message_chunk
+                        
+                        # 增量解析JSON，requests中的每个请求一解析完整就提前发给code_server
+                        import ijson
+                        events = ijson.sendable_list()
+                        parser = ijson.parse_coro(events)
+                        current_req = None
                         
                         # 开始流式消息
-                        self.http_server.add_message_chunk("assistant", "")
+                        add_message_chunk("assistant", "")
                         
                         # 处理流式响应
-                        for chunk in response:
-                            if chunk.choices and len(chunk.choices) > 0:
-                                delta = chunk.choices[0].delta
-                                if hasattr(delta, 'content') and delta.content:
+                        async for chunk in response:
+                            choices = chunk.choices
+                            if choices:
+                                content = choices[0].delta.content
+                                if content:
                                     # 将每个块添加到完整响应
-                                    full_response += delta.content
+                                    append_chunk(content)
                                     
                                     # 实时推送到HTTP服务器
-                                    self.http_server.add_message_chunk("assistant", delta.content)
-                                
-                                
+                                    add_message_chunk("assistant", content)
+                                    
+                                    if parser is None:
+                                        continue
+                                    try:
+                                        parser.send(content.encode('utf-8'))
+                                    except ijson.JSONError:
+                                        # 不是合法JSON，交给analyze_task最终解析时处理
+                                        parser = None
+                                        continue
+                                    for prefix, event, value in events:
+                                        if prefix == 'requests.item':
+                                            if event == 'start_map':
+                                                current_req = {}
+                                            elif event == 'end_map' and current_req is not None:
+                                                self._prefetch_request(current_req, prefetch)
+                                                current_req = None
+                                        elif prefix.startswith('requests.item.') and current_req is not None and event == 'string':
+                                            current_req[prefix[len('requests.item.'):]] = value
+                                    del events[:]
                         
                         # 流式响应完成，结束消息流
                         self.http_server.finish_stream_message()
+                        full_response = ''.join(chunks)
+                        
+                        if self.semantic_cache:
+                            await self.semantic_cache.update(messages, full_response, semantic)
                         
                         # 返回完整响应
                         return full_response
                     else:
                         # 使用非流式接口
-                        response = self.client.beta.chat.completions.parse(
+                        response = await self.client.chat.completions.create(
                             model=self.model,
                             messages=messages,
                             temperature=0.1,
@@ -164,26 +507,96 @@ class LLMAnalyzer:
                             top_p=0.95,
                             frequency_penalty=0,
                             presence_penalty=0,
-                            # tools=self.functions,  # 添加tools参数
-                            tool_choice="auto",  # 设置tool_choice
                             response_format={"type": "json_object"}  # 设置返回格式为JSON
                         )
+                        if self.semantic_cache:
+                            await self.semantic_cache.update(messages, response.choices[0].message.content, semantic)
                         return response.choices[0].message
                 except (openai.RateLimitError, openai.APIError) as e:
                     if attempt < max_retries - 1:
                         logger.warning(f"API调用失败，尝试重试 ({attempt+1}/{max_retries}): {str(e)}")
-                        time.sleep(retry_delay * (2 ** attempt))  # 指数退避
+                        await asyncio.sleep(retry_delay * (2 ** attempt))  # 指数退避
                     else:
                         raise
         except Exception as e:
             logger.error(f"调用OpenAI API时出错: {str(e)}")
             logger.error(f"错误信息: {traceback.format_exc()}")
-            return f"API调用错误: {str(e)}"
+            # API调用失败不是大模型的回答，直接抛出，由调用方把任务记录为分析出错
+            raise
     
-    def analyze_task(self, problem_prompt):
+    def _prefetch_request(self, req: Dict, prefetch: Optional[Dict]):
+        """在流式响应尚未结束时提前发起单个code_server请求"""
+        if prefetch is None or req.get('command') not in ('get_symbol', 'find_refs') or 'sym_name' not in req:
+            return
+        key = (req['command'], req['sym_name'])
+        if key in prefetch:
+            return
+        if req['command'] == 'get_symbol':
+            prefetch[key] = asyncio.ensure_future(self.code_analyzer.get_symbol_info(req['sym_name']))
+        else:
+            prefetch[key] = asyncio.ensure_future(self.code_analyzer.find_all_refs(req['sym_name']))
+
+    @staticmethod
+    def _drop_prefetch(prefetch: Dict):
+        """取消本轮没有用到的提前请求"""
+        for fut in prefetch.values():
+            if not fut.done():
+                fut.cancel()
+            elif not fut.cancelled():
+                # 取出异常，避免未使用的失败请求在回收时报错
+                fut.exception()
+        prefetch.clear()
+
+    async def _dispatch_requests(self, requests: List[Dict], prefetch: Optional[Dict] = None) -> List[Any]:
+        """按command分组，每种command只调用一次code_server批量接口，结果按原请求顺序返回
+        
+        已经在流式接收阶段提前发起的请求直接等待其结果，不再重复发送
+        """
+        prefetch = prefetch or {}
+        reqs = [req for req in requests if req['command'] in ('get_symbol', 'find_refs')]
+        keys = [(req['command'], req['sym_name']) for req in reqs]
+        # 同一轮中重复的(command, sym_name)只请求一次，结果复用
+        unique_keys = list(dict.fromkeys(keys))
+        fetched_keys = [key for key in unique_keys if key in prefetch]
+        sym_keys = [key for key in unique_keys if key not in prefetch and key[0] == 'get_symbol']
+        ref_keys = [key for key in unique_keys if key not in prefetch and key[0] == 'find_refs']
+        fetched, sym_results, ref_results = await asyncio.gather(
+            asyncio.gather(*[prefetch[key] for key in fetched_keys]),
+            self.code_analyzer.get_symbols_batch([key[1] for key in sym_keys]),
+            self.code_analyzer.find_refs_batch([key[1] for key in ref_keys]),
+        )
+        seen = dict(zip(fetched_keys, fetched))
+        seen.update(zip(sym_keys, sym_results))
+        seen.update(zip(ref_keys, ref_results))
+        return [seen[key] for key in keys]
+
+    async def _handle_conclusion(self, message: Dict, messages: List[Dict], result: Dict, prefetch: Dict) -> bool:
+        """tsj_have或者tsj_nothave：结束对话并保存结果"""
+        result['has_problem_info'] = message['tag'] == 'tsj_have'
+        result['problem_info'] = message.get('problem_info')
+        result['response'] = message.get('response')
+        return True
+
+    async def _handle_next(self, message: Dict, messages: List[Dict], result: Dict, prefetch: Dict) -> bool:
+        """tsj_next：同一轮的请求批量发送，结果按原顺序添加到消息列表
+        
+        结果以JSON文本返回给大模型，比Python repr更短，也更容易被模型理解
+        """
+        append = messages.append
+        for res in await self._dispatch_requests(message['requests'], prefetch):
+            append({"role": "user", "content": orjson.dumps(res).decode('utf-8')})
+        return False
+
+    async def analyze_task(self, problem_prompt, semantic: Optional[tuple] = None):
+        """分析一个任务
+
+        Args:
+            problem_prompt: prepare_context生成的prompt
+            semantic: (问题类型, 待分析代码)，用于首轮对话查询语义缓存
+        """
         messages = [
-            {"role": "system", "content": problem_prompt['system'] + "\n请使用工具调用获取代码信息并分析问题。"},
-            {"role": "user", "content": problem_prompt['init_user']+self.prompt_need}
+            {"role": "system", "content": ''.join((problem_prompt['system'], self._system_suffix))},
+            {"role": "user", "content": ''.join((problem_prompt['init_user'], self.prompt_need))}
         ]
         conversation_complete = False
         max_turns = 5
@@ -203,41 +616,39 @@ class LLMAnalyzer:
                 self.http_server.add_message(msg["role"], msg["content"])
         
         while not conversation_complete and turn < max_turns:
-            # 调用OpenAI API获取响应
-            if self.http_server:
-                # 使用流式接口，响应会实时推送到HTTP服务器
-                llm_response = self.query_openai(messages, stream=True)
-            else:
-                # 使用非流式接口
-                llm_response = self.query_openai(messages, stream=False)
-            
-            
+            # 流式接收过程中提前发起的code_server请求
+            prefetch = {}
+            # 后续轮次的上下文包含了code_server的查询结果，只做精确匹配
+            turn_semantic = semantic if turn == 0 else None
+            try:
+                # 调用OpenAI API获取响应，调用失败时异常直接抛给调用方
+                if self.http_server:
+                    # 使用流式接口，响应会实时推送到HTTP服务器
+                    llm_response = await self.query_openai(messages, stream=True, prefetch=prefetch, semantic=turn_semantic)
+                else:
+                    # 使用非流式接口
+                    llm_response = await self.query_openai(messages, stream=False, semantic=turn_semantic)
+                
                 # 处理普通响应
-                response_content = llm_response.content if hasattr(llm_response, 'content') else str(llm_response)
+                response_content = _content(llm_response)
                 messages.append({"role": "assistant", "content": response_content})
-                message = json.loads(response_content)
-                print(message)
                 # 如果HTTP服务开启且使用非流式接口，添加完整助手消息
                 # 流式接口已经在query_openai中实时添加消息块了
                 if self.http_server and not self.http_server.has_active_stream:
                     self.http_server.add_message("assistant", response_content)
                 
-                # 检查是否包含问题信息,通过tag判断，如果是tsj_have或者tsj_nothave就结束对话并将结果保存
-                if 'tag' in message:
-                    if message['tag'] == 'tsj_have' or message['tag'] == 'tsj_nothave':
-                        conversation_complete = True
-                        result['has_problem_info'] = message['tag'] == 'tsj_have'
-                        result['problem_info'] = message['problem_info'] if 'problem_info' in message else None
-                        result['response'] = message['response'] if 'response' in message else None
-                    if message['tag'] == 'tsj_next':
-                        # 处理tsj_next标签，添加请求到消息列表
-                        for req in message['requests']:
-                            if req['command'] == 'get_symbol':
-                                messages.append({"role": "user", "content": str(self.code_analyzer.get_symbol_info(req['sym_name']))})
-                            elif req['command'] == 'find_refs':
-                                messages.append({"role": "user", "content": str(self.code_analyzer.find_all_refs(req['sym_name']))})
-                
-                
+                # 解析并校验返回格式，不是合法JSON或不符合要求时把错误反馈给大模型，下一轮重新回答
+                try:
+                    message = orjson.loads(response_content)
+                    self._validate(message)
+                except (orjson.JSONDecodeError, fastjsonschema.JsonSchemaException) as e:
+                    messages.append({"role": "user", "content": f"返回格式不符合要求: {str(e)}，请按要求的JSON格式重新回答。"})
+                else:
+                    print(message)
+                    # 通过tag分发处理，tsj_have或者tsj_nothave结束对话并将结果保存
+                    conversation_complete = await self._handlers[message['tag']](message, messages, result, prefetch)
+            finally:
+                self._drop_prefetch(prefetch)
                 
             turn += 1
         
@@ -286,40 +697,67 @@ def custom_serializer(obj):
     raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
 
 class ResultProcessor:
-    """结果处理器，负责生成结果数据和HTML报告"""
+    """结果处理器，负责生成结果数据和HTML报告
+    
+    结果保存在data_dir下的SQLite数据库中（WAL模式），每次运行用run_id区分，
+    并发写入时不必争抢同一个结果文件。
+    """
     
     def __init__(self, data_dir: str):
         self.data_dir = data_dir
-        timestamp = time.strftime("%Y%m%d%H%M%S")
-        self.result_file = os.path.join(data_dir, f"analysis_result_{timestamp}.json")
+        self.run_id = uuid.uuid4().hex
+        self.result_file = os.path.join(data_dir, "analysis.sqlite")
         os.makedirs(data_dir, exist_ok=True)
-        with open(self.result_file, 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
-        
-    
-    def save_results(self, result) -> str:
-        """保存分析结果到JSON文件"""
-        with open(self.result_file, 'r+', encoding='utf-8') as f:
-            results = json.load(f)
-            results.append(result)
-            f.seek(0)
-            json.dump(results, f, ensure_ascii=False, indent=2, default=custom_serializer)
-
-def check_code_server(server: str) -> bool:
-    """检查code_server是否存活"""
-    try:
-        ip, port = server.split(':')
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(1)
-        result = sock.connect_ex((ip, int(port)))
-        sock.close()
-        return result == 0
-    except:
-        return False
-    
+        # 每个线程使用自己的连接
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        conn = self._conn()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS results("
+                         "id INTEGER PRIMARY KEY, run TEXT, ts REAL, task_json BLOB, result_json BLOB)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_run ON results(run)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # check_same_thread=False只是为了close()能统一关闭各线程的连接，连接本身不跨线程使用
+            conn = sqlite3.connect(self.result_file, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
     
+    def save_results(self, result, task=None) -> None:
+        """插入一条分析结果到SQLite，可在任意线程调用"""
+        task_json = orjson.dumps(task, default=custom_serializer, option=orjson.OPT_NON_STR_KEYS) if task is not None else None
+        result_json = orjson.dumps(result, default=custom_serializer, option=orjson.OPT_NON_STR_KEYS)
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT INTO results(run, ts, task_json, result_json) VALUES(?,?,?,?)",
+                         (self.run_id, time.time(), task_json, result_json))
+
+    def close(self):
+        """关闭所有线程的数据库连接"""
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
+        self._local = threading.local()
+
+    def to_json_array(self, json_file: Optional[str] = None) -> str:
+        """把本次运行的结果导出为JSON数组文件，供需要整体读取的下游使用"""
+        json_file = json_file or os.path.join(self.data_dir, f"analysis_result_{self.run_id}.json")
+        rows = self._conn().execute("SELECT result_json FROM results WHERE run=? ORDER BY id", (self.run_id,))
+        results = [orjson.loads(row[0]) for row in rows]
+        with open(json_file, 'wb') as f:
+            f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+        return json_file
+
 
-def main():
+async def main():
     parser = argparse.ArgumentParser(description='敏感信息日志打印分析工具')
     parser.add_argument('--server', required=True, help='code_server 的ip和port，格式为ip:port')
     parser.add_argument('--data-dir', default='./tsj_data', help='数据和报告输出目录')
@@ -330,10 +768,6 @@ def main():
 
     
     args = parser.parse_args()
-    #检测code_server是否存活
-    # if not check_code_server(args.server):
-    #     logger.error(f"code_server {args.server} 未启动")
-    #     return
     # 确保输出目录存在
     os.makedirs(args.data_dir, exist_ok=True)
     
@@ -342,18 +776,17 @@ def main():
         # 创建默认配置
         default_config = {
             "log_functions": ["printf", "fprintf", "log_info", "log_error", "printk"],
-            "max_call_depth": 3
+            "max_call_depth": 3,
+            "max_parallel_tasks": 8,
+            "problem_types": ["sensitive"]
         }
-        with open(args.config, 'w', encoding='utf-8') as f:
-            json.dump(default_config, f, indent=2)
+        with open(args.config, 'wb') as f:
+            f.write(orjson.dumps(default_config, option=orjson.OPT_INDENT_2))
         
         logger.info(f"已创建默认配置文件: {args.config}")
     
-    with open(args.config, 'r', encoding='utf-8') as f:
-        config = json.load(f)
-    
-    # 初始化代码分析器
-    code_analyzer = CodeAnalyzer(args.server)
+    with open(args.config, 'rb') as f:
+        config = orjson.loads(f.read())
     
     # 获取日志函数调用路径
     log_functions = config.get("log_functions", [])
@@ -401,30 +834,85 @@ def main():
             logger.error(traceback.format_exc())
             http_server = None
     
-    # 初始化LLM分析器
-    llm_analyzer = LLMAnalyzer(code_analyzer, api_key, base_url, model, http_server)
-    
-    #################################register different type of vuln
-    problem_type = [
-        sensitive_problem,
-        # command_inject_problem,
-        # overflow_problem,
-        # mem_leak_problem
-        # jsoncpp_problem
-    ]
-    result_processor = ResultProcessor(args.data_dir)
-    for problem in problem_type:
-        task_list = problem.get_task_list(config, code_analyzer)
-        # print(task_list)
-        #todo batch mode
-        for i in range(len(task_list)):
-            task = task_list[i]
-            result = llm_analyzer.analyze_task(problem.prepare_context(task))
-            print('one task complete,res:',result)
-            result_processor.save_results(result)
+    # 初始化代码分析器
+    async with CodeAnalyzer(args.server,
+                            cache_file=config.get("symbol_cache_file"),
+                            revision=config.get("code_server_revision")) as code_analyzer:
+        #检测code_server是否存活
+        if not code_analyzer.alive:
+            logger.error(f"code_server {args.server} 未启动")
+            return
+        
+        # 初始化LLM分析器
+        semantic_cache = None
+        result_processor = None
+        try:
+            if config.get("semantic_cache", False):
+                semantic_cache = SemanticCache(
+                    config.get("semantic_cache_file", os.path.join(args.data_dir, "llm_cache")),
+                    threshold=config.get("semantic_cache_threshold", 0.9),
+                    model_name=config.get("embedding_model", "all-MiniLM-L6-v2"),
+                )
+            llm_analyzer = LLMAnalyzer(code_analyzer, api_key, base_url, model, http_server, semantic_cache)
+        
+            # 启用的问题类型，默认只分析敏感信息泄露
+            try:
+                problem_type = [load_problem(name) for name in config.get("problem_types", ["sensitive"])]
+            except ValueError as e:
+                logger.error(str(e))
+                return
+            result_processor = ResultProcessor(args.data_dir)
+        
+            # 多个任务并发分析，同时进行的任务数由max_parallel_tasks限制
+            # HTTP对话流界面同一时间只能展示一个任务，开启时退化为串行
+            max_parallel_tasks = 1 if http_server else config.get("max_parallel_tasks", 8)
+            sem = asyncio.Semaphore(max_parallel_tasks)
+        
+            async def run(problem, task):
+                try:
+                    async with sem:
+                        result = await llm_analyzer.analyze_task(problem.prepare_context(task),
+                                                                 semantic=(problem.__name__, task['content']))
+                except Exception as e:
+                    logger.error(f"分析任务时出错: {str(e)}")
+                    logger.error(traceback.format_exc())
+                    if http_server:
+                        http_server.update_task_status("idle")
+                    # 出错的任务也要记录下来，标记为有问题，留待人工复核
+                    result = {
+                        "has_problem_info": True,
+                        "problem_info": f"分析出错: {str(e)}",
+                        "conversation": []
+                    }
+                print('one task complete,res:',result)
+                # 写库放到线程里执行，不阻塞事件循环，每个线程使用自己的SQLite连接
+                await asyncio.to_thread(result_processor.save_results, result, task)
+        
+            # 各问题类型的任务枚举并发进行，所有任务汇总后一起交给并发执行器
+            task_lists = await asyncio.gather(*[problem.get_task_list(config, code_analyzer) for problem in problem_type])
+            # print(task_lists)
+            await asyncio.gather(*[
+                run(problem, task)
+                for problem, task_list in zip(problem_type, task_lists)
+                for task in task_list
+            ])
+            # 同时导出本次运行的JSON数组，兼容读取analysis_result_*.json的下游
+            json_file = result_processor.to_json_array()
+        finally:
+            # 中途出错也要关闭结果数据库和语义缓存，保证已写入的数据落盘
+            if result_processor:
+                result_processor.close()
+            if semantic_cache:
+                semantic_cache.close()
     
-    logger.info(f"分析完成！结果已保存到: {result_processor.result_file}")
+    logger.info(f"分析完成！结果已保存到: {result_processor.result_file} (run={result_processor.run_id})，并导出到: {json_file}")
 
 
 if __name__ == "__main__":
-    main()
+    # 安装了uvloop时使用uvloop事件循环，否则使用asyncio默认事件循环
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
@@ -1,9 +1,9 @@
 class sensitive_problem:
-    def get_task_list(config, code_analyzer):
+    async def get_task_list(config, code_analyzer):
         log_functions = config.get('log_functions',[])
         task_list = []
-        for func in log_functions:
-            refs = code_analyzer.find_all_refs(func)
+        refs_list = await code_analyzer.find_refs_batch(log_functions)
+        for func, refs in zip(log_functions, refs_list):
             for ref in refs:
                 task = {}
                 task['func'] = func
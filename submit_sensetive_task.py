@@ -1,8 +1,7 @@
 from dis import code_info
 import os
-import json
+import orjson
 import subprocess
-import base64
 
 prompt_init = """
 你是代码安全专家tsj，专注于从代码中识别敏感信息泄露，你的输出应该是json格式
@@ -80,18 +79,21 @@ if __name__ == "__main__":
         exit(1)
     print(result.stdout)
     # print(result.stderr)
-    calls = json.loads(result.stdout)
+    calls = orjson.loads(result.stdout)
+    # 所有调用点的任务通过一次batch_submit提交，每行一个任务，prompt直接以原文放在JSON中
+    lines = []
     for call in calls['callers']:
         content = call
         prompt_user = prompt_user_template.format(content=content,log_func=func_name)
-        prompt_init_b64 = base64.b64encode(prompt_init.encode('utf-8')).decode('ascii')
-        prompt_user_b64 = base64.b64encode(prompt_user.encode('utf-8')).decode('ascii')
-        cmd_args = [binary, 'submit', '--system-prompt-b64', prompt_init_b64, '--user-prompt-b64', prompt_user_b64, '--code-server', code_server, '--llm-config', llm_config, '--id', 'test_print_log']
-        result = subprocess.run(cmd_args, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"Command failed with return code {result.returncode}")
-            print(cmd_args)
-            print(result.stderr)
-            print(result.stdout)
-            exit(1)
-        print(result.stdout)
+        lines.append(orjson.dumps({'id': 'test_print_log', 'system_prompt': prompt_init, 'user_prompt': prompt_user}).decode('utf-8'))
+    cmd_args = [binary, 'batch_submit', '--code-server', code_server, '--llm-config', llm_config]
+    proc = subprocess.Popen(cmd_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    # communicate同时读写管道，任务很多时也不会因为管道写满而互相阻塞
+    stdout, stderr = proc.communicate('\n'.join(lines) + '\n')
+    for line in stdout.splitlines():
+        print(line)
+    if proc.returncode != 0:
+        print(f"Command failed with return code {proc.returncode}")
+        print(cmd_args)
+        print(stderr)
+        exit(1)